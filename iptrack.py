@@ -1,19 +1,101 @@
 import os
+import re
 import json
+import time
 from datetime import datetime
+from zoneinfo import ZoneInfo
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import streamlit as st
-import folium
-from streamlit_folium import st_folium
 import socket
-import pytz
+import ipaddress
+import threading
+from types import MappingProxyType
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 
-# speedtest-cli package exposes module "speedtest"
+# orjson is optional; fall back to requests' stdlib-based json()
 try:
-    import speedtest  # pip install speedtest-cli
+    import orjson
 except Exception:
-    speedtest = None
+    orjson = None
+
+
+# ----------------------------
+# Constants
+# ----------------------------
+# OpenVPN, L2TP, IKEv2, PPTP, WireGuard
+VPN_PORTS = (1194, 1701, 500, 4500, 1723, 51820)
+
+# Seconds to wait on reverse DNS before treating the lookup as failed
+RDNS_TIMEOUT_S = 2.0
+
+# socket.herror codes (netdb.h HOST_NOT_FOUND, NO_DATA) meaning "no PTR record";
+# TRY_AGAIN and NO_RECOVERY are resolver failures and keep the verdict uncached
+RDNS_NO_RECORD_ERRNOS = (1, 4)
+
+VPN_KEYWORDS = (
+    "vpn", "proxy", "tunnel", "wireguard", "openvpn",
+    "nordvpn", "expressvpn", "surfshark", "cyberghost",
+    "m247", "leaseweb", "choopa", "colo", "datacamp", "g-core",
+    "digitalocean", "ovh", "hetzner", "linode", "aws", "azure", "google",
+)
+# One compiled scan for all keywords. The lookahead reports overlapping hits
+# ("vpn" inside "nordvpn") the same way the per-keyword `in` checks did.
+VPN_KEYWORD_RE = re.compile("(?=(" + "|".join(map(re.escape, VPN_KEYWORDS)) + "))")
+
+# (minimum risk score, confidence), highest first; below the last tier is "not a VPN"
+VPN_CONFIDENCE_TIERS = ((70, "Very High"), (50, "High"), (30, "Medium"), (15, "Low"))
+
+WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
+CURRENT_FIELDS = (
+    "temperature_2m,relative_humidity_2m,apparent_temperature,"
+    "precipitation,weather_code,wind_speed_10m"
+)
+
+# Placeholder network result when the user did not opt into the speed test
+SPEEDTEST_SKIPPED = MappingProxyType({
+    "download_speed": "N/A",
+    "upload_speed": "N/A",
+    "ping": "N/A",
+    "success": False,
+    "skipped": True,
+    "error": "Skipped (enable the speed test option to measure)",
+    "debug_info": [],
+})
+
+# Longest a 429/503 Retry-After is honored before retrying; larger values are clipped
+RETRY_AFTER_CAP_S = 5
+
+# Per-host circuit breaker: after this many consecutive failures, skip the host for a while
+BREAKER_MAX_FAILURES = 3
+BREAKER_COOLDOWN_S = 60
+
+# Windy returns 25 webcams by default; only this many are shown
+WEBCAM_LIMIT = 5
+
+# open-meteo WMO weather codes (read-only view; built once per script run)
+WEATHER_CODES = MappingProxyType({
+    0: "Clear sky", 1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
+    45: "Fog", 48: "Depositing rime fog", 51: "Light drizzle", 53: "Moderate drizzle",
+    55: "Dense drizzle", 56: "Light freezing drizzle", 57: "Dense freezing drizzle",
+    61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
+    66: "Light freezing rain", 67: "Heavy freezing rain",
+    71: "Slight snow fall", 73: "Moderate snow fall", 75: "Heavy snow fall",
+    77: "Snow grains", 80: "Slight rain showers", 81: "Moderate rain showers",
+    82: "Violent rain showers", 85: "Slight snow showers", 86: "Heavy snow showers",
+    95: "Thunderstorm", 96: "Thunderstorm with slight hail", 99: "Thunderstorm with heavy hail",
+})
+
+# Per-session memo of full tracking results, oldest entry evicted first
+TRACKING_CACHE_SIZE = 32
+
+try:
+    WAT_TZ = ZoneInfo("Africa/Lagos")
+except Exception:
+    WAT_TZ = None
 
 
 # ----------------------------
@@ -28,29 +110,127 @@ st.set_page_config(
 # ----------------------------
 # Utilities
 # ----------------------------
+class CappedRetry(Retry):
+    """urllib3 Retry that never sleeps longer than RETRY_AFTER_CAP_S on a Retry-After header."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, RETRY_AFTER_CAP_S)
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Shared HTTP session; cached so keep-alive connections survive reruns."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        # one pool per host: ipify, httpbin, ip-api, open-meteo, windy (+ headroom)
+        pool_connections=8,
+        # the session is shared by every browser session and fan-out thread
+        pool_maxsize=20,
+        # ip-api's free tier answers 429 past 45 req/min; back off with jitter and honor Retry-After
+        max_retries=CappedRetry(
+            total=3,
+            # retry a refused connect once; never re-send after a read timeout, so a hung
+            # host costs one timeout and still surfaces as requests' Timeout
+            connect=1,
+            read=False,
+            backoff_factor=0.5,
+            backoff_jitter=0.25,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            # hand the last 429/5xx back so raise_for_status() reports it plainly
+            raise_on_status=False,
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # requests already advertises gzip/deflate, plus br once Brotli is installed
+    session.headers.update({"User-Agent": "iptrack/1.0"})
+    return session
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+
+@st.cache_resource
+def get_circuit_state() -> dict:
+    """{host: (consecutive_failures, open_until)}, shared across reruns and worker threads."""
+    return {}
+
+
+def is_host_failure(exc: Exception) -> bool:
+    """Connection problems, timeouts, 429 and 5xx count against a host; other 4xx do not."""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        status = exc.response.status_code if exc.response is not None else 0
+        return status == 429 or status >= 500
+    return isinstance(exc, requests.exceptions.RequestException)
+
+
 def safe_get_json(url: str, timeout: int = 10, headers: dict | None = None, params: dict | None = None):
     """Requests JSON with solid error handling."""
-    resp = requests.get(url, timeout=timeout, headers=headers, params=params)
-    resp.raise_for_status()
+    host = urlparse(url).netloc
+    circuits = get_circuit_state()
+    failures, open_until = circuits.get(host, (0, 0.0))
+    if open_until > time.monotonic():
+        raise CircuitOpenError(f"{host} is temporarily unavailable (skipping after repeated failures)")
+
     try:
-        return resp.json()
+        resp = get_session().get(url, timeout=timeout, headers=headers, params=params)
+        resp.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        if is_host_failure(e):
+            failures += 1
+            reopen = time.monotonic() + BREAKER_COOLDOWN_S if failures >= BREAKER_MAX_FAILURES else 0.0
+            circuits[host] = (failures, reopen)
+        raise
+    circuits.pop(host, None)
+
+    # Error pages (e.g. HTML from a proxy or rate limiter) are rejected up front
+    content_type = resp.headers.get("content-type", "")
+    if "json" not in content_type:
+        raise ValueError(f"Non-JSON response from {url} (content-type: {content_type or 'missing'})")
+    try:
+        return orjson.loads(resp.content) if orjson is not None else resp.json()
     except Exception as e:
         raise ValueError(f"Invalid JSON from {url}: {e}") from e
 
 
+def dig(d, *keys, default=None):
+    """Walk nested dicts by key; return default as soon as a level is missing."""
+    for k in keys:
+        d = d.get(k) if isinstance(d, dict) else None
+        if d is None:
+            return default
+    return d
+
+
+def fmt_unit(value, unit: str) -> str:
+    """Append a unit, or 'N/A' when the value is missing."""
+    return f"{value}{unit}" if value not in (None, "N/A") else "N/A"
+
+
 def validate_ip_address(ip: str) -> bool:
-    """Basic IPv4 validation; empty is 'ok' meaning use public IP."""
-    if not ip:
+    """IPv4/IPv6 validation via the stdlib parser; empty is 'ok' meaning use public IP."""
+    if not ip or not ip.strip():
+        return True
+    try:
+        ipaddress.ip_address(ip.strip())
         return True
-    parts = ip.split(".")
-    if len(parts) != 4:
+    except ValueError:
         return False
+
+
+def is_bogon(ip: str) -> bool:
+    """True for addresses that are not globally routable (RFC1918, loopback, CGNAT, link-local...)."""
     try:
-        return all(0 <= int(p) <= 255 for p in parts)
+        return not ipaddress.ip_address(ip).is_global
     except ValueError:
         return False
 
 
+@st.cache_data(ttl=300, show_spinner=False)
 def get_public_ip() -> str:
     """Get public IP via multiple fallbacks."""
     services = [
@@ -73,6 +253,24 @@ def get_public_ip() -> str:
     raise RuntimeError("All IP detection services failed")
 
 
+def resolve_target_ip(raw: str | None) -> str:
+    """Validated IP from the input box, or the public IP when it is blank."""
+    ip = (raw or "").strip()
+    if not validate_ip_address(ip):
+        raise ValueError(f"Invalid IP address: {ip}")
+    return ip or get_public_ip()
+
+
+def probe_port(ip: str, port: int, timeout: float = 0.5) -> bool:
+    """True if a TCP connect to ip:port succeeds within the timeout."""
+    try:
+        # create_connection picks AF_INET or AF_INET6 to match the address
+        with socket.create_connection((ip, port), timeout=timeout):
+            return True
+    except Exception:
+        return False
+
+
 def check_vpn_status(ip_address: str, geo_data: dict) -> dict:
     vpn_indicators = {
         "is_vpn": False,
@@ -80,62 +278,64 @@ def check_vpn_status(ip_address: str, geo_data: dict) -> dict:
         "indicators": [],
         "risk_score": 0,
         "debug_info": [],
+        # True when a check errored or timed out; such verdicts are not cached
+        "incomplete": False,
     }
 
     try:
-        isp = str(geo_data.get("isp", "")).lower()
-        org = str(geo_data.get("org", "")).lower()
-        as_info = str(geo_data.get("as", "")).lower()
-        country = str(geo_data.get("country", "")).lower()
+        # ISP, org and AS text read once and lowercased in one go; newline-separated
+        # so keyword hits cannot span fields (no keyword contains "\n")
+        provider_text = "\n".join(str(geo_data.get(k) or "") for k in ("isp", "org", "as")).lower()
+
+        # RDNS and the port probes all wait on the network, so run them side by
+        # side; a resolver slower than RDNS_TIMEOUT_S is abandoned, not awaited
+        ex = ThreadPoolExecutor(max_workers=len(VPN_PORTS) + 1)
+        try:
+            rdns = ex.submit(socket.gethostbyaddr, ip_address)
+            reachable = ex.map(lambda port: probe_port(ip_address, port), VPN_PORTS)
+            open_ports = [port for port, is_open in zip(VPN_PORTS, reachable) if is_open]
+            try:
+                hostname = rdns.result(timeout=RDNS_TIMEOUT_S)[0].lower()
+            except socket.herror as e:
+                hostname = None
+                if e.errno not in RDNS_NO_RECORD_ERRNOS:
+                    vpn_indicators["incomplete"] = True
+            except Exception:
+                hostname = None
+                vpn_indicators["incomplete"] = True
+        finally:
+            ex.shutdown(wait=False)
 
         # --------------------
         # Reverse DNS check
         # --------------------
-        try:
-            hostname = socket.gethostbyaddr(ip_address)[0].lower()
+        if hostname:
             vpn_indicators["debug_info"].append(f"RDNS: {hostname}")
             if any(v in hostname for v in ["vpn", "cloud", "vps", "host", "server"]):
                 vpn_indicators["indicators"].append(f"Suspicious RDNS: {hostname}")
                 vpn_indicators["risk_score"] += 20
-        except Exception:
+        else:
             vpn_indicators["debug_info"].append("RDNS lookup failed")
 
         # --------------------
         # Known provider keywords
         # --------------------
-        vpn_keywords = [
-            "vpn", "proxy", "tunnel", "wireguard", "openvpn",
-            "nordvpn", "expressvpn", "surfshark", "cyberghost",
-            "m247", "leaseweb", "choopa", "colo", "datacamp", "g-core",
-            "digitalocean", "ovh", "hetzner", "linode", "aws", "azure", "google"
-        ]
-        for kw in vpn_keywords:
-            if kw in isp or kw in org or kw in as_info:
+        matched = set(VPN_KEYWORD_RE.findall(provider_text))
+        for kw in VPN_KEYWORDS:
+            if kw in matched:
                 vpn_indicators["indicators"].append(f'Match keyword "{kw}"')
                 vpn_indicators["risk_score"] += 15
 
         # --------------------
         # Bogon / private range
         # --------------------
-        private_prefixes = ("10.", "172.16.", "192.168.", "127.")
-        if ip_address.startswith(private_prefixes):
+        if is_bogon(ip_address):
             vpn_indicators["indicators"].append("Private/Bogon IP – suspicious for VPN masking")
             vpn_indicators["risk_score"] += 25
 
         # --------------------
         # Lightweight port check
         # --------------------
-        common_ports = [1194, 1701, 500, 4500, 1723, 51820]  # OpenVPN, L2TP, IKEv2, PPTP, WireGuard
-        open_ports = []
-        for port in common_ports:
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(0.5)
-                if sock.connect_ex((ip_address, port)) == 0:
-                    open_ports.append(port)
-                sock.close()
-            except Exception:
-                continue
         if open_ports:
             vpn_indicators["indicators"].append(f"Open VPN-related ports: {open_ports}")
             vpn_indicators["risk_score"] += 25
@@ -145,24 +345,75 @@ def check_vpn_status(ip_address: str, geo_data: dict) -> dict:
         # --------------------
         score = max(0, min(100, vpn_indicators["risk_score"]))
         vpn_indicators["risk_score"] = score
-        if score >= 70:
-            vpn_indicators.update({"is_vpn": True, "confidence": "Very High"})
-        elif score >= 50:
-            vpn_indicators.update({"is_vpn": True, "confidence": "High"})
-        elif score >= 30:
-            vpn_indicators.update({"is_vpn": True, "confidence": "Medium"})
-        elif score >= 15:
-            vpn_indicators.update({"is_vpn": True, "confidence": "Low"})
+        conf = next((c for threshold, c in VPN_CONFIDENCE_TIERS if score >= threshold), None)
+        if conf is not None:
+            vpn_indicators.update({"is_vpn": True, "confidence": conf})
     except Exception as e:
         vpn_indicators["indicators"].append(f"Error in VPN detection: {e}")
         vpn_indicators["debug_info"].append(str(e))
+        vpn_indicators["incomplete"] = True
 
     return vpn_indicators
 
 
-def measure_network_speed() -> dict:
-    """Run speed test safely. Returns friendly strings and debug info."""
-    if speedtest is None:
+class VpnCheckIncomplete(Exception):
+    """Carries a check_vpn_status() verdict that errored or timed out out of the cache."""
+
+    def __init__(self, verdict: dict):
+        super().__init__("VPN check incomplete")
+        self.verdict = verdict
+
+
+def cached_vpn_status(ip_address: str, geo_data: dict) -> dict:
+    """check_vpn_status() memoized per IP; errored or timed-out verdicts are not cached."""
+    try:
+        return _cached_vpn_status(ip_address, geo_data)
+    except VpnCheckIncomplete as e:
+        return e.verdict
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_vpn_status(ip_address: str, geo_data: dict) -> dict:
+    verdict = check_vpn_status(ip_address, geo_data)
+    if verdict["incomplete"]:
+        raise VpnCheckIncomplete(verdict)
+    return verdict
+
+
+def new_speedtest_client():
+    """speedtest.Speedtest with a browser-like client user agent."""
+    import speedtest
+
+    stest = speedtest.Speedtest(secure=True)
+    # Avoid KeyError if config shape differs
+    try:
+        client = stest.config.get("client")
+        if isinstance(client, dict):
+            client["useragent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    except Exception:
+        pass
+    return stest
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def find_speedtest_server() -> dict:
+    """Best speedtest server; fetching and pinging the server list is the slow part."""
+    stest = new_speedtest_client()
+    stest.get_servers()
+    return stest.get_best_server()
+
+
+def measure_network_speed(progress: dict | None = None) -> dict:
+    """Run speed test safely. Returns friendly strings and debug info.
+
+    If given, ``progress`` is updated in place ("stage", then "ping" and
+    "download_speed") so a caller on another thread can show partial results.
+    """
+    progress = {} if progress is None else progress
+    # Imported lazily: speedtest-cli is slow to import and only needed here
+    try:
+        import speedtest  # speedtest-cli package exposes module "speedtest"
+    except Exception:
         return {
             "download_speed": "N/A",
             "upload_speed": "N/A",
@@ -172,18 +423,21 @@ def measure_network_speed() -> dict:
             "debug_info": [],
         }
     try:
-        stest = speedtest.Speedtest(secure=True)
-        # Avoid KeyError if config shape differs
+        stest = new_speedtest_client()
+        progress["stage"] = "Selecting the best speedtest server..."
+        # Re-ping only the cached best server instead of downloading the full list again
         try:
-            client = stest.config.get("client")
-            if isinstance(client, dict):
-                client["useragent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        except Exception:
-            pass
-
-        stest.get_servers()
-        stest.get_best_server()
+            stest.get_best_server([find_speedtest_server()])
+        except speedtest.SpeedtestException:
+            # The cached server stopped answering: pick afresh from the full list, once
+            find_speedtest_server.clear()
+            stest.get_best_server([find_speedtest_server()])
+        if stest.results.ping is not None:
+            progress["ping"] = f"{float(stest.results.ping):.2f} ms"
+        progress["stage"] = "Measuring download speed..."
         download = stest.download() / 1_000_000.0
+        progress["download_speed"] = f"{download:.2f} Mbps"
+        progress["stage"] = "Measuring upload speed..."
         upload = stest.upload() / 1_000_000.0
         ping = stest.results.ping
 
@@ -250,23 +504,278 @@ def measure_network_speed() -> dict:
 
 
 def get_weather_description(code: int) -> str:
-    weather_codes = {
-        0: "Clear sky", 1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
-        45: "Fog", 48: "Depositing rime fog", 51: "Light drizzle", 53: "Moderate drizzle",
-        55: "Dense drizzle", 56: "Light freezing drizzle", 57: "Dense freezing drizzle",
-        61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
-        66: "Light freezing rain", 67: "Heavy freezing rain",
-        71: "Slight snow fall", 73: "Moderate snow fall", 75: "Heavy snow fall",
-        77: "Snow grains", 80: "Slight rain showers", 81: "Moderate rain showers",
-        82: "Violent rain showers", 85: "Slight snow showers", 86: "Heavy snow showers",
-        95: "Thunderstorm", 96: "Thunderstorm with slight hail", 99: "Thunderstorm with heavy hail",
+    return WEATHER_CODES.get(int(code) if code is not None else 0, f"Unknown (code {code})")
+
+
+def format_weather(cur: dict) -> dict:
+    """Display strings for an open-meteo "current" block."""
+    return {
+        "temp": fmt_unit(cur.get("temperature_2m"), "°C"),
+        "humidity": fmt_unit(cur.get("relative_humidity_2m"), "%"),
+        "apparent_temp": fmt_unit(cur.get("apparent_temperature"), "°C"),
+        "precipitation": fmt_unit(cur.get("precipitation"), " mm"),
+        "wind_speed": fmt_unit(cur.get("wind_speed_10m"), " km/h"),
+        "description": get_weather_description(cur.get("weather_code", 0)),
     }
-    return weather_codes.get(int(code) if code is not None else 0, f"Unknown (code {code})")
+
+
+class GeoLookupError(ValueError):
+    """ip-api answered with status "fail" (private range, invalid query, quota...)."""
+
+
+def fetch_geo(ip: str) -> dict:
+    """ip-api geolocation record, cached per IP for a day; "fail" answers are not cached."""
+    try:
+        return _fetch_geo(ip)
+    except GeoLookupError as e:
+        return {"status": "fail", "message": str(e)}
+
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def _fetch_geo(ip: str) -> dict:
+    geo_data = safe_get_json(f"http://ip-api.com/json/{ip}", timeout=10)
+    if geo_data.get("status") == "fail":
+        raise GeoLookupError(geo_data.get("message", "Unknown error"))
+    return geo_data
+
+
+def fetch_weather(lat: float, lon: float) -> dict | None:
+    """Current conditions from open-meteo; None if the payload shape is unexpected.
+
+    Coordinates are rounded to ~1 km so nearby lookups share a cache entry.
+    """
+    return _fetch_weather(round(lat, 2), round(lon, 2))
+
+
+@st.cache_data(ttl=900, show_spinner=False)
+def _fetch_weather(lat: float, lon: float) -> dict | None:
+    params = {"latitude": lat, "longitude": lon, "current": CURRENT_FIELDS, "timezone": "auto"}
+    weather_data = safe_get_json(WEATHER_URL, timeout=10, params=params)
+    cur = weather_data.get("current") if isinstance(weather_data, dict) else None
+    return cur if isinstance(cur, dict) else None
+
+
+class WebcamLookupError(ValueError):
+    """Windy answered without status "OK" (bad request, quota...)."""
+
+
+def fetch_webcams(lat: float, lon: float, key: str) -> tuple[list, str | None]:
+    """Up to five nearby Windy webcams plus an optional API message. Network errors propagate.
+
+    Non-OK answers come back as the message and are not cached.
+    """
+    try:
+        return _fetch_webcams(round(lat, 2), round(lon, 2), key)
+    except WebcamLookupError as e:
+        return [], f"⚠️ Webcam API response: {e}"
+
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def _fetch_webcams(lat: float, lon: float, key: str) -> tuple[list, str | None]:
+    headers = {"x-windy-key": key}
+    params = {"show": "webcams:location,image,player"}
+    webcam_url = f"https://api.windy.com/api/webcams/v3/list/nearby={lat},{lon},50/limit={WEBCAM_LIMIT}"
+    webcam_data = safe_get_json(webcam_url, timeout=15, headers=headers, params=params)
+    if not (isinstance(webcam_data, dict) and webcam_data.get("status") == "OK"):
+        msg = webcam_data.get("message", "Unknown error") if isinstance(webcam_data, dict) else "Invalid response"
+        raise WebcamLookupError(msg)
+
+    return parse_webcams(webcam_data), None
+
+
+def parse_webcams(webcam_data: dict) -> list[dict]:
+    """Flatten Windy's nested webcam records into display rows in one pass."""
+    cams = dig(webcam_data, "result", "webcams", default=[])[:WEBCAM_LIMIT]
+    return [
+        {
+            "title": cam.get("title", f"Webcam {i+1}"),
+            "image_url": dig(cam, "image", "current", "preview"),
+            "location": f"{dig(cam, 'location', 'city', default='Unknown')}, "
+                        f"{dig(cam, 'location', 'region', default='Unknown')}",
+            "embed_code": dig(cam, "player", "day", "embed"),
+        }
+        for i, cam in enumerate(cams)
+        if isinstance(cam, dict)
+    ]
+
+
+@st.cache_resource
+def get_background_pool() -> ThreadPoolExecutor:
+    """Long-lived pool for work that should keep running across reruns (speed tests).
+
+    A single worker: two tests at once would share this server's uplink and
+    each report roughly half the real speed.
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="speedtest")
+
+
+@st.cache_resource
+def get_speed_test_slot() -> dict:
+    """The speed test in flight, shared by all sessions: {"future", "progress", "lock"}."""
+    return {"future": None, "progress": {}, "lock": threading.Lock()}
+
+
+def start_speed_test(ip: str) -> None:
+    """Attach a tracked IP to the running speed test, starting one if none is in flight.
+
+    The test measures this server's own link rather than the tracked IP, so
+    every IP that asks while a test runs gets that test's result.
+    """
+    if ip in st.session_state.speed_jobs:
+        return
+    slot = get_speed_test_slot()
+    with slot["lock"]:
+        if slot["future"] is None or slot["future"].done():
+            slot["progress"] = {}
+            slot["future"] = get_background_pool().submit(measure_network_speed, slot["progress"])
+        st.session_state.speed_progress[ip] = slot["progress"]
+        st.session_state.speed_jobs[ip] = slot["future"]
+
+
+def collect_speed_results() -> None:
+    """Move finished background speed tests into their cached tracking results."""
+    jobs = st.session_state.speed_jobs
+    for ip, fut in list(jobs.items()):
+        if not fut.done():
+            continue
+        del jobs[ip]
+        st.session_state.speed_progress.pop(ip, None)
+        exc = fut.exception()
+        if exc is None:
+            speed = fut.result()
+        else:
+            speed = {
+                "download_speed": "N/A",
+                "upload_speed": "N/A",
+                "ping": "N/A",
+                "success": False,
+                "error": str(exc),
+                "debug_info": [f"Network performance error: {exc}"],
+            }
+        cached = st.session_state.tracking_cache.get(ip)
+        if cached is not None:
+            cached["network"] = {"speed": speed}
+
+
+def gather_track_data(ip: str, geo_data: dict, lat: float, lon: float, windy_key: str) -> dict:
+    """Run the post-geolocation lookups concurrently in one pool.
+
+    Mirrors asyncio.gather(..., return_exceptions=True): each value is the
+    lookup's result or the exception it raised. "webcams" is omitted without a key.
+    """
+    jobs = {
+        "vpn_status": (cached_vpn_status, ip, geo_data),
+        "weather": (fetch_weather, lat, lon),
+    }
+    if windy_key:
+        jobs["webcams"] = (fetch_webcams, lat, lon, windy_key)
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as ex:
+        futures = {name: ex.submit(*job) for name, job in jobs.items()}
+    return {name: fut.exception() or fut.result() for name, fut in futures.items()}
 
 
 # ----------------------------
 # UI helpers
 # ----------------------------
+@st.fragment(run_every=1)
+def speed_test_pending(ip: str):
+    """Placeholder that polls the background speed test and reruns the app once it finishes."""
+    fut = st.session_state.speed_jobs.get(ip)
+    if fut is None or fut.done():
+        st.rerun()
+    progress = st.session_state.speed_progress.get(ip) or {}
+    st.info(f"⏳ {progress.get('stage', 'Measuring network performance in the background...')}")
+    if progress.get("download_speed") or progress.get("ping"):
+        pcol1, pcol2 = st.columns(2)
+        with pcol1:
+            st.metric("⬇️ Download Speed", progress.get("download_speed", "…"))
+        with pcol2:
+            st.metric("🏓 Ping", progress.get("ping", "…"))
+
+
+def is_windy_auth_error(outcome) -> bool:
+    """True when Windy rejected the API key (HTTP 401/403)."""
+    return (
+        isinstance(outcome, requests.exceptions.HTTPError)
+        and outcome.response is not None
+        and outcome.response.status_code in (401, 403)
+    )
+
+
+def is_final_webcam_outcome(outcome) -> bool:
+    """True for a Windy answer worth keeping per IP: webcams (maybe none) and no error message."""
+    return isinstance(outcome, tuple) and outcome[1] is None
+
+
+def webcam_fields(outcome) -> tuple[list, str | None]:
+    """Map a fetch_webcams outcome (result, exception, or None without a key) to results fields."""
+    if outcome is None:
+        return [], "💡 Tip: Provide a Windy API key to fetch nearby webcams."
+    if is_windy_auth_error(outcome):
+        return [], "❌ Invalid Windy API key"
+    if isinstance(outcome, CircuitOpenError):
+        return [], "⚠️ Windy API temporarily unavailable"
+    if isinstance(outcome, requests.exceptions.RequestException):
+        return [], f"❌ Network error fetching webcams: {outcome}"
+    if isinstance(outcome, Exception):
+        return [], f"❌ Error fetching webcams: {outcome}"
+    return outcome
+
+
+def weather_fields(outcome) -> tuple[dict | None, str | None]:
+    """Map a fetch_weather outcome (result or exception) to (formatted weather, warning)."""
+    if isinstance(outcome, CircuitOpenError):
+        return None, "⚠️ Weather API temporarily unavailable"
+    if isinstance(outcome, requests.exceptions.RequestException):
+        return None, f"⚠️ Could not fetch weather data (network): {outcome}"
+    if isinstance(outcome, Exception):
+        return None, f"⚠️ Could not fetch weather data: {outcome}"
+    if isinstance(outcome, dict):
+        return format_weather(outcome), None
+    return None, "⚠️ Weather data format unexpected"
+
+
+def build_map_html(results: dict) -> str:
+    """Render the location map to standalone HTML (display only, no click capture)."""
+    # Imported lazily so page loads without a map skip folium/branca setup
+    import folium
+
+    lat, lon = results["lat"], results["lon"]
+    m = folium.Map(location=[lat, lon], zoom_start=12, tiles="OpenStreetMap")
+
+    popup_text = f"""
+    <b>{results.get('city','Unknown')}, {results.get('country','Unknown')}</b><br>
+    IP: {results.get('ip_address','N/A')}<br>
+    ISP: {results.get('isp','N/A')}<br>
+    Coordinates: {lat:.4f}, {lon:.4f}
+    """
+
+    folium.Marker(
+        [lat, lon],
+        popup=folium.Popup(popup_text, max_width=300),
+        tooltip="Click for details",
+        icon=folium.Icon(color="red", icon="info-sign"),
+    ).add_to(m)
+
+    folium.Circle(
+        [lat, lon],
+        radius=1000,
+        color="blue",
+        fill=True,
+        fill_color="blue",
+        fill_opacity=0.2,
+        popup="Approximate location area",
+    ).add_to(m)
+
+    return m.get_root().render()
+
+
+def md_lines(*lines) -> str:
+    """Join lines into one Markdown block with hard line breaks, for a single st.markdown call."""
+    return "  \n".join(lines)
+
+
 def display_results(results: dict):
     if not results:
         return
@@ -275,25 +784,32 @@ def display_results(results: dict):
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("📍 IP Information")
-            st.write(f"**IP Address:** {results.get('ip_address','N/A')}")
-            st.write(f"**ISP:** {results.get('isp','N/A')}")
-            st.write(f"**Organization:** {results.get('org','N/A')}")
-            st.write(f"**AS:** {results.get('as_info','N/A')}")
+            st.markdown(md_lines(
+                f"**IP Address:** {results.get('ip_address','N/A')}",
+                f"**ISP:** {results.get('isp','N/A')}",
+                f"**Organization:** {results.get('org','N/A')}",
+                f"**AS:** {results.get('as_info','N/A')}",
+            ))
 
         with col2:
             st.subheader("🌐 Location Details")
-            st.write(f"**City:** {results.get('city','N/A')}")
-            st.write(f"**Region:** {results.get('region','N/A')}")
-            st.write(f"**Country:** {results.get('country','N/A')}")
-            st.write(f"**ZIP Code:** {results.get('zip_code','N/A')}")
             lat = results.get("lat"); lon = results.get("lon")
             if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
-                st.write(f"**Coordinates:** {lat:.4f}, {lon:.4f}")
+                coords = f"{lat:.4f}, {lon:.4f}"
             else:
-                st.write("**Coordinates:** N/A")
+                coords = "N/A"
+            st.markdown(md_lines(
+                f"**City:** {results.get('city','N/A')}",
+                f"**Region:** {results.get('region','N/A')}",
+                f"**Country:** {results.get('country','N/A')}",
+                f"**ZIP Code:** {results.get('zip_code','N/A')}",
+                f"**Coordinates:** {coords}",
+            ))
 
         st.subheader("📡 Network Performance")
-        network = results.get("network", {})
+        network = results.get("network")
+        if network is None and results.get("ip_address") in st.session_state.speed_jobs:
+            speed_test_pending(results["ip_address"])
         speed = (network or {}).get("speed", {})
         if speed.get("success"):
             ncol1, ncol2 = st.columns(2)
@@ -302,6 +818,8 @@ def display_results(results: dict):
                 st.metric("⬆️ Upload Speed", speed.get("upload_speed", "N/A"))
             with ncol2:
                 st.metric("🏓 Ping", speed.get("ping", "N/A"))
+        elif speed.get("skipped"):
+            st.info(f"ℹ️ Speed test: {speed.get('error')}")
         else:
             if speed:
                 st.warning(f"⚠️ Speed test: {speed.get('error','Unavailable')}")
@@ -309,8 +827,7 @@ def display_results(results: dict):
         dbg = speed.get("debug_info") or []
         if dbg:
             with st.expander("🔍 Network Test Debug Info", expanded=False):
-                for x in dbg:
-                    st.write(f"• {x}")
+                st.markdown(md_lines(*(f"• {x}" for x in dbg)))
 
         # VPN
         st.subheader("🔒 VPN/Proxy Analysis")
@@ -329,19 +846,17 @@ def display_results(results: dict):
 
             score = int(vpn_info.get("risk_score", 0))
             risk_emoji = "🔴" if score >= 50 else ("🟡" if score >= 25 else "🟢")
-            st.write(f"**Risk Score:** {risk_emoji} {score}/100")
-
             inds = vpn_info.get("indicators") or []
-            if inds:
-                st.write("**Detection Indicators:**")
-                for i in inds:
-                    st.write(f"• {i}")
+            st.markdown(md_lines(
+                f"**Risk Score:** {risk_emoji} {score}/100",
+                *(["**Detection Indicators:**"] if inds else []),
+                *(f"• {i}" for i in inds),
+            ))
 
             dinfo = vpn_info.get("debug_info") or []
             if dinfo:
                 with st.expander("🔧 Debug Information", expanded=False):
-                    for d in dinfo:
-                        st.write(f"• {d}")
+                    st.markdown(md_lines(*(f"• {d}" for d in dinfo)))
 
             st.info("💡 VPN detection is heuristic and may not be 100% accurate.")
         else:
@@ -351,33 +866,10 @@ def display_results(results: dict):
         st.subheader("🗺️ Location on Map")
         try:
             if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
-                m = folium.Map(location=[lat, lon], zoom_start=12, tiles="OpenStreetMap")
-
-                popup_text = f"""
-                <b>{results.get('city','Unknown')}, {results.get('country','Unknown')}</b><br>
-                IP: {results.get('ip_address','N/A')}<br>
-                ISP: {results.get('isp','N/A')}<br>
-                Coordinates: {lat:.4f}, {lon:.4f}
-                """
-
-                folium.Marker(
-                    [lat, lon],
-                    popup=folium.Popup(popup_text, max_width=300),
-                    tooltip="Click for details",
-                    icon=folium.Icon(color="red", icon="info-sign"),
-                ).add_to(m)
-
-                folium.Circle(
-                    [lat, lon],
-                    radius=1000,
-                    color="blue",
-                    fill=True,
-                    fill_color="blue",
-                    fill_opacity=0.2,
-                    popup="Approximate location area",
-                ).add_to(m)
-
-                st_folium(m, width=700, height=500, key=f"map_{results.get('ip_address','unknown')}")
+                # Rendered once per tracked IP; reruns re-embed the stored HTML
+                if not results.get("map_html"):
+                    results["map_html"] = build_map_html(results)
+                st.components.v1.html(results["map_html"], width=700, height=500)
             else:
                 st.info("Location coordinates unavailable; map skipped.")
         except Exception as e:
@@ -432,6 +924,10 @@ for key, default in [
     ("show_results", False),
     ("ip_input", ""),
     ("current_public_ip", None),
+    ("tracking_cache", {}),
+    ("windy_key_status", {}),
+    ("speed_jobs", {}),
+    ("speed_progress", {}),
 ]:
     if key not in st.session_state:
         st.session_state[key] = default
@@ -463,6 +959,22 @@ with st.sidebar:
     if st.session_state.get("current_public_ip"):
         st.info(f"🌐 **Your Current IP:** {st.session_state.current_public_ip}")
 
+    if st.button("♻️ Force Refresh", key="force_refresh_btn", help="Drop cached lookups and fetch fresh data"):
+        get_public_ip.clear()
+        _fetch_geo.clear()
+        _cached_vpn_status.clear()
+        _fetch_weather.clear()
+        _fetch_webcams.clear()
+        find_speedtest_server.clear()
+        # Also give tripped hosts and rejected Windy keys a fresh chance
+        get_circuit_state().clear()
+        st.session_state.windy_key_status = {}
+        st.session_state.tracking_cache = {}
+        st.session_state.tracking_results = None
+        st.session_state.last_tracked_ip = None
+        st.session_state.show_results = False
+        st.rerun()
+
     # Manual weather coords (optional, replaces brittle browser geolocation hack)
     st.markdown("---")
     st.subheader("📍 Optional Weather Coordinates")
@@ -472,10 +984,10 @@ with st.sidebar:
     if st.button("🔒 Get VPN Status", key="get_vpn_btn"):
         try:
             with st.spinner("Checking VPN status..."):
-                current_ip = (st.session_state.get("ip_input") or "").strip() or get_public_ip()
-                geo_data = safe_get_json(f"http://ip-api.com/json/{current_ip}", timeout=10)
+                current_ip = resolve_target_ip(st.session_state.get("ip_input"))
+                geo_data = fetch_geo(current_ip)
                 if geo_data.get("status") == "success":
-                    vpn_status = check_vpn_status(current_ip, geo_data)
+                    vpn_status = cached_vpn_status(current_ip, geo_data)
                     if vpn_status["is_vpn"]:
                         conf = vpn_status["confidence"]
                         if conf in ("Very High", "High"):
@@ -509,8 +1021,8 @@ with st.sidebar:
                     st.warning("Manual coordinates invalid; falling back to IP-based location.")
 
                 if lat is None or lon is None:
-                    current_ip = (st.session_state.get("ip_input") or "").strip() or get_public_ip()
-                    geo = safe_get_json(f"http://ip-api.com/json/{current_ip}", timeout=10)
+                    current_ip = resolve_target_ip(st.session_state.get("ip_input"))
+                    geo = fetch_geo(current_ip)
                     if geo.get("status") == "success":
                         lat = geo.get("lat"); lon = geo.get("lon")
                         city = geo.get("city", "Unknown")
@@ -521,24 +1033,19 @@ with st.sidebar:
                         st.error(f"❌ Could not determine location: {geo.get('message','Unknown error')}")
                         st.stop()
 
-                weather_url = (
-                    "https://api.open-meteo.com/v1/forecast"
-                    f"?latitude={lat}&longitude={lon}"
-                    "&current=temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,weather_code,wind_speed_10m"
-                    "&timezone=auto"
-                )
-                w = safe_get_json(weather_url, timeout=10)
-                if isinstance(w, dict) and "current" in w and isinstance(w["current"], dict):
-                    cur = w["current"]
-                    weather_desc = get_weather_description(cur.get("weather_code", 0))
+                cur = fetch_weather(lat, lon)
+                if cur:
+                    weather = format_weather(cur)
                     st.success("🌤️ **Current Weather:**")
-                    st.write(f"🌡️ **Temperature:** {cur.get('temperature_2m','N/A')}°C")
-                    st.write(f"🤒 **Feels Like:** {cur.get('apparent_temperature','N/A')}°C")
-                    st.write(f"💧 **Humidity:** {cur.get('relative_humidity_2m','N/A')}%")
-                    st.write(f"💨 **Wind Speed:** {cur.get('wind_speed_10m','N/A')} km/h")
-                    st.write(f"☁️ **Conditions:** {weather_desc}")
+                    st.write(f"🌡️ **Temperature:** {weather['temp']}")
+                    st.write(f"🤒 **Feels Like:** {weather['apparent_temp']}")
+                    st.write(f"💧 **Humidity:** {weather['humidity']}")
+                    st.write(f"💨 **Wind Speed:** {weather['wind_speed']}")
+                    st.write(f"☁️ **Conditions:** {weather['description']}")
                 else:
                     st.error("❌ Weather data not available")
+        except CircuitOpenError:
+            st.warning("⚠️ Weather API temporarily unavailable")
         except requests.exceptions.RequestException as e:
             st.error(f"❌ Network error getting weather: {e}")
         except Exception as e:
@@ -558,6 +1065,15 @@ windy_api_key = st.text_input(
     key="windy_key",
     help="Get a free API key at https://api.windy.com/keys",
 )
+windy_key = (windy_api_key or "").strip()
+# Keys Windy already rejected are not retried this session
+windy_key_bad = st.session_state.windy_key_status.get(windy_key) == "bad"
+
+run_speedtest = st.checkbox(
+    "Also run full speed test (slow, ~30 s)",
+    value=False,
+    key="run_speedtest",
+)
 
 # Buttons
 button_col1, button_col2 = st.columns([1, 1])
@@ -576,7 +1092,7 @@ with button_col2:
 # ----------------------------
 if track_button:
     if ip_address and not validate_ip_address(ip_address):
-        st.error("❌ Invalid IP address format. Please enter a valid IPv4 address.")
+        st.error("❌ Invalid IP address format. Please enter a valid IPv4 or IPv6 address.")
     else:
         current_ip = (ip_address or "").strip()
         if not current_ip:
@@ -588,14 +1104,11 @@ if track_button:
                 st.error(f"❌ Error fetching public IP: {e}")
                 st.stop()
 
-        need_new = (
-            not st.session_state.tracking_results
-            or st.session_state.last_tracked_ip != current_ip
-        )
-        if need_new:
+        cached = st.session_state.tracking_cache.get(current_ip)
+        if cached is None:
             try:
                 with st.spinner("Fetching location data..."):
-                    geo_data = safe_get_json(f"http://ip-api.com/json/{current_ip}", timeout=10)
+                    geo_data = fetch_geo(current_ip)
                     if geo_data.get("status") == "fail":
                         st.error(f"❌ Error: {geo_data.get('message','Unknown error')}")
                         st.stop()
@@ -605,6 +1118,11 @@ if track_button:
                         st.error("❌ Unable to determine coordinates for this IP address.")
                         st.stop()
 
+                    # Only queued once geolocation succeeded, so a failed lookup never pays for
+                    # a 30 s test; it still runs alongside the VPN/weather/webcam fan-out below
+                    if run_speedtest:
+                        start_speed_test(current_ip)
+
                     results = {
                         "ip_address": current_ip,
                         "lat": lat,
@@ -619,99 +1137,52 @@ if track_button:
                         "weather": None,
                         "webcams": [],
                         "webcam_message": None,
+                        "webcams_requested": bool(windy_key),
                         "vpn_status": None,
                         "network": None,
                     }
 
+                # VPN, speed, weather and webcams only need geo data: fetch them concurrently
+                with st.spinner("Gathering data..."):
+                    fetched = gather_track_data(
+                        current_ip, geo_data, lat, lon, "" if windy_key_bad else windy_key
+                    )
+
                 # VPN status
-                try:
-                    with st.spinner("Checking VPN/Proxy status..."):
-                        results["vpn_status"] = check_vpn_status(current_ip, geo_data)
-                except Exception as e:
-                    st.warning(f"⚠️ Could not check VPN status: {e}")
-                    results["vpn_status"] = {
+                vpn_status = fetched["vpn_status"]
+                if isinstance(vpn_status, Exception):
+                    st.warning(f"⚠️ Could not check VPN status: {vpn_status}")
+                    vpn_status = {
                         "is_vpn": False, "confidence": "Unknown",
-                        "indicators": [f"VPN check failed: {e}"], "risk_score": 0,
+                        "indicators": [f"VPN check failed: {vpn_status}"], "risk_score": 0,
                     }
+                results["vpn_status"] = vpn_status
 
-                # Network speed
-                try:
-                    with st.spinner("Measuring network performance..."):
-                        results["network"] = {"speed": measure_network_speed()}
-                except Exception as e:
-                    st.warning(f"⚠️ Could not measure network performance: {e}")
-                    results["network"] = {
-                        "speed": {
-                            "download_speed": "N/A",
-                            "upload_speed": "N/A",
-                            "ping": "N/A",
-                            "success": False,
-                            "error": str(e),
-                            "debug_info": [f"Network performance error: {e}"],
-                        }
-                    }
+                if not run_speedtest:
+                    results["network"] = {"speed": dict(SPEEDTEST_SKIPPED)}
 
-                # Weather
-                try:
-                    with st.spinner("Fetching weather data..."):
-                        weather_url = (
-                            "https://api.open-meteo.com/v1/forecast"
-                            f"?latitude={lat}&longitude={lon}"
-                            "&current=temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,weather_code,wind_speed_10m"
-                            "&timezone=auto"
-                        )
-                        weather_data = safe_get_json(weather_url, timeout=10)
-                        cur = weather_data.get("current") if isinstance(weather_data, dict) else None
-                        if isinstance(cur, dict):
-                            weather_desc = get_weather_description(cur.get("weather_code", 0))
-                            results["weather"] = {
-                                "temp": f"{cur.get('temperature_2m','N/A')}°C" if cur.get("temperature_2m") is not None else "N/A",
-                                "humidity": f"{cur.get('relative_humidity_2m','N/A')}%" if cur.get("relative_humidity_2m") is not None else "N/A",
-                                "apparent_temp": f"{cur.get('apparent_temperature','N/A')}°C" if cur.get("apparent_temperature") is not None else "N/A",
-                                "precipitation": f"{cur.get('precipitation', 0)} mm",
-                                "wind_speed": f"{cur.get('wind_speed_10m','N/A')} km/h" if cur.get("wind_speed_10m") is not None else "N/A",
-                                "description": weather_desc,
-                            }
-                        else:
-                            st.warning("⚠️ Weather data format unexpected")
-                except requests.exceptions.RequestException as e:
-                    st.warning(f"⚠️ Could not fetch weather data (network): {e}")
-                except Exception as e:
-                    st.warning(f"⚠️ Could not fetch weather data: {e}")
+                # Weather; a failed lookup leaves "weather" None and is retried on a cache hit
+                results["weather"], warning = weather_fields(fetched["weather"])
+                if warning:
+                    st.warning(warning)
 
                 # Webcams (Windy)
-                key = (windy_api_key or "").strip()
-                if key:
-                    try:
-                        with st.spinner("Searching for nearby webcams..."):
-                            headers = {"x-windy-key": key}
-                            params = {"show": "webcams:location,image,player"}
-                            webcam_url = f"https://api.windy.com/api/webcams/v3/list/nearby={lat},{lon},50"
-                            webcam_data = safe_get_json(webcam_url, timeout=15, headers=headers, params=params)
-                            if isinstance(webcam_data, dict) and webcam_data.get("status") == "OK":
-                                cams = (webcam_data.get("result") or {}).get("webcams") or []
-                                for i, cam in enumerate(cams[:5]):
-                                    if not isinstance(cam, dict):
-                                        continue
-                                    img = (((cam.get("image") or {}).get("current") or {}).get("preview"))
-                                    loc = cam.get("location") or {}
-                                    player = (cam.get("player") or {}).get("day") or {}
-                                    results["webcams"].append({
-                                        "title": cam.get("title", f"Webcam {i+1}"),
-                                        "image_url": img,
-                                        "location": f"{loc.get('city','Unknown')}, {loc.get('region','Unknown')}",
-                                        "embed_code": player.get("embed"),
-                                    })
-                            else:
-                                msg = webcam_data.get("message", "Unknown error") if isinstance(webcam_data, dict) else "Invalid response"
-                                results["webcam_message"] = f"⚠️ Webcam API response: {msg}"
-                    except requests.exceptions.RequestException as e:
-                        results["webcam_message"] = f"❌ Network error fetching webcams: {e}"
-                    except Exception as e:
-                        results["webcam_message"] = f"❌ Error fetching webcams: {e}"
+                if windy_key_bad:
+                    results["webcam_message"] = "❌ Invalid Windy API key"
+                    results["webcams_requested"] = False
                 else:
-                    results["webcam_message"] = "💡 Tip: Provide a Windy API key to fetch nearby webcams."
-
+                    outcome = fetched.get("webcams")
+                    if is_windy_auth_error(outcome):
+                        st.session_state.windy_key_status[windy_key] = "bad"
+                    if not is_final_webcam_outcome(outcome):
+                        # Not a final answer: retry the lookup on the next cache hit
+                        results["webcams_requested"] = False
+                    results["webcams"], results["webcam_message"] = webcam_fields(outcome)
+
+                cache = st.session_state.tracking_cache
+                cache[current_ip] = results
+                if len(cache) > TRACKING_CACHE_SIZE:
+                    cache.pop(next(iter(cache)))
                 st.session_state.tracking_results = results
                 st.session_state.last_tracked_ip = current_ip
                 st.session_state.show_results = True
@@ -725,12 +1196,43 @@ if track_button:
             except Exception as e:
                 st.error(f"❌ Unexpected error: {e}")
         else:
+            # Lookups that failed (or were skipped) when this IP was cached are redone
+            # on their own rather than served stale; the rest of the entry is reused
+            if cached.get("weather") is None:
+                with st.spinner("Fetching weather data..."):
+                    try:
+                        outcome = fetch_weather(cached["lat"], cached["lon"])
+                    except Exception as e:
+                        outcome = e
+                cached["weather"], warning = weather_fields(outcome)
+                if warning:
+                    st.warning(warning)
+            # Likewise a Windy key added since, or a webcam lookup that failed
+            if windy_key and not windy_key_bad and not cached.get("webcams_requested"):
+                with st.spinner("Searching for nearby webcams..."):
+                    try:
+                        outcome = fetch_webcams(cached["lat"], cached["lon"], windy_key)
+                    except Exception as e:
+                        outcome = e
+                cached["webcams"], cached["webcam_message"] = webcam_fields(outcome)
+                if is_windy_auth_error(outcome):
+                    st.session_state.windy_key_status[windy_key] = "bad"
+                elif is_final_webcam_outcome(outcome):
+                    cached["webcams_requested"] = True
+            # Likewise, opting into the speed test later only runs the speed test
+            network = cached.get("network") or {}
+            if run_speedtest and (network.get("speed") or {}).get("skipped"):
+                cached["network"] = None
+                start_speed_test(current_ip)
+            st.session_state.tracking_results = cached
+            st.session_state.last_tracked_ip = current_ip
             st.session_state.show_results = True
             st.info("ℹ️ Showing cached results for this IP address.")
 
 # ----------------------------
 # Results
 # ----------------------------
+collect_speed_results()
 if st.session_state.show_results and st.session_state.tracking_results:
     st.markdown("---")
     st.subheader(f"📊 Results for IP: {st.session_state.tracking_results.get('ip_address','N/A')}")
@@ -740,17 +1242,16 @@ if st.session_state.show_results and st.session_state.tracking_results:
 # Footer
 # ----------------------------
 st.markdown("---")
-try:
-    wat_tz = pytz.timezone("Africa/Lagos")
-    current_time = datetime.now(wat_tz)
-    formatted_time = current_time.strftime("%I:%M %p WAT on %A, %B %d, %Y")
-    st.markdown(f"**Current Time:** {formatted_time}")
-except Exception:
-    current_time = datetime.utcnow()
-    formatted_time = current_time.strftime("%I:%M %p UTC on %A, %B %d, %Y")
-    st.markdown(f"**Current Time:** {formatted_time}")
+if WAT_TZ is not None:
+    formatted_time = datetime.now(WAT_TZ).strftime("%I:%M %p WAT on %A, %B %d, %Y")
+else:
+    formatted_time = datetime.utcnow().strftime("%I:%M %p UTC on %A, %B %d, %Y")
+st.markdown(f"**Current Time:** {formatted_time}")
 
 st.markdown("**Note:** IP geolocation is approximate and may vary.")
-st.markdown("**Privacy:** This app does not store IPs or locations.")
+st.markdown(
+    "**Privacy:** Looked-up IPs and their locations are kept in server memory only, for up to "
+    "24 hours, to speed up repeat lookups; nothing is written to disk. ♻️ Force Refresh clears them."
+)
 st.markdown("**Network Tests:** Results depend on server availability.")
 st.markdown("Developed by Hacker Joe.")
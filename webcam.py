@@ -1,10 +1,18 @@
+import ipaddress
 import webbrowser
 
-# Ask the user for the IP address of the webcam
-ip_address = input("Enter the IP address of the webcam: ")
 
-# Construct the URL for the webcam view
-url = f"http://{ip_address}/"
+def build_webcam_url(ip_address):
+    """URL of the webcam's web view; raises ValueError if ip_address is not an IP."""
+    ip = ipaddress.ip_address(ip_address.strip())
+    # RFC 6874: a zone ID's "%" is written as "%25" inside the brackets
+    host = f"[{str(ip).replace('%', '%25')}]" if ip.version == 6 else str(ip)
+    return f"http://{host}/"
 
-# Open the webcam view in the default browser
-webbrowser.open(url)
\ No newline at end of file
+
+if __name__ == "__main__":
+    # Ask the user for the IP address of the webcam
+    ip_address = input("Enter the IP address of the webcam: ")
+
+    # Open the webcam view in the default browser
+    webbrowser.open(build_webcam_url(ip_address))